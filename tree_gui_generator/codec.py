@@ -0,0 +1,256 @@
+"""Binary tree format.
+
+A ``.tgb`` file holds all trees of one run or shard::
+
+    magic "TGB\\x01"
+    varint nnames, then nnames times: varint length, utf-8 name      -- string table of widget names
+    records till the end of the stream:
+        varint tree_id, varint record length, record                 -- one tree
+    record: pre-order nodes, every node is varint name id, varint number of children
+
+The whole stream may be gzip or zstd compressed, the reader detects it by the leading bytes. zstd needs the optional
+``zstandard`` package.
+"""
+
+__all__ = ["COMPRESSIONS", "TreeFileWriter", "TreeFileReader", "JsonTreeWriter", "decode_tree", "tree_path",
+           "trees_file_name", "is_trees_file", "check_compression"]
+
+import gzip
+import zlib
+from pathlib import Path
+from typing import List, Iterator, Tuple, Optional, BinaryIO
+
+from tree_gui_generator.dto import NodeDTO, TreeDTO
+from tree_gui_generator.fileproc import FileProc
+from tree_gui_generator.model import Node, Tree, DTOMapper
+from tree_gui_generator.varint import encode_varint, decode_varint
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# errors of decompressors on corrupt data, a cut off gzip stream raises EOFError instead
+CORRUPT_STREAM_ERRORS = (gzip.BadGzipFile, zlib.error) + (() if zstandard is None else (zstandard.ZstdError,))
+
+MAGIC = b"TGB\x01"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSIONS = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+CHUNK_SIZE = 1 << 20
+
+
+def tree_path(otp_path: Path, itree: int) -> Path:
+    return otp_path / f"tree{itree + 1}.json"
+
+
+def trees_file_name(shard_index: int, shard_count: int, compression: str) -> str:
+    name = "trees" if shard_count == 1 else f"trees_{shard_index}_of_{shard_count}"
+    return f"{name}.tgb{COMPRESSIONS[compression]}"
+
+
+def is_trees_file(p: Path) -> bool:
+    return any(p.name.endswith(f".tgb{suffix}") for suffix in COMPRESSIONS.values())
+
+
+def check_compression(compression: str):
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"unknown compression '{compression}', expected one of {list(COMPRESSIONS)}")
+    if compression == "zstd" and zstandard is None:
+        raise RuntimeError("zstd compression requires the 'zstandard' package")
+
+
+class JsonTreeWriter(object):
+    """Writes every tree to its own ``tree<N>.json`` file, the default output format."""
+
+    def __init__(self, otp_path: Path):
+        self._otp_path = otp_path
+
+    def __enter__(self) -> 'JsonTreeWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def write(self, tree_id: int, tree: Tree):
+        FileProc.write_json(DTOMapper.map_tree_dto(tree), tree_path(self._otp_path, tree_id))
+
+
+class TreeFileWriter(object):
+    """Streams trees to a ``.tgb`` file. Trees may consist of ``Node`` or ``NodeDTO`` objects."""
+
+    def __init__(self, p: Path, names: List[str], compression: str = "none"):
+        check_compression(compression)
+        self._path = p
+        self._names = list(names)
+        self._name_ids = {name: name_id for name_id, name in enumerate(self._names)}
+        self._compression = compression
+        self._out: Optional[BinaryIO] = None
+
+    def __enter__(self) -> 'TreeFileWriter':
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        if self._compression == "gzip":
+            self._out = gzip.open(self._path, "wb", compresslevel=6)
+        elif self._compression == "zstd":
+            self._out = zstandard.ZstdCompressor(level=3).stream_writer(open(self._path, "wb"))
+        else:
+            self._out = open(self._path, "wb")
+
+        header = bytearray(MAGIC)
+        encode_varint(len(self._names), header)
+        for name in self._names:
+            name_bytes = name.encode("utf-8")
+            encode_varint(len(name_bytes), header)
+            header += name_bytes
+        self._out.write(header)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._out.close()
+        return False
+
+    def write(self, tree_id: int, tree: Tree):
+        record = bytearray()
+        self._encode_node(tree.root, record)
+        self.write_record(tree_id, record)
+
+    def write_record(self, tree_id: int, record: bytes):
+        """Writes an already encoded tree, its name ids must refer to the same string table."""
+        header = bytearray()
+        encode_varint(tree_id, header)
+        encode_varint(len(record), header)
+        self._out.write(header)
+        self._out.write(record)
+
+    def _encode_node(self, node: 'Node', out: bytearray):
+        encode_varint(self._name_ids[node.name], out)
+        encode_varint(len(node.children), out)
+        for child in node.children:
+            self._encode_node(child, out)
+
+
+def decode_tree(record: bytes, names: List[str]) -> TreeDTO:
+    """Decodes a record written by ``TreeFileWriter`` with the string table ``names``.
+
+    Raises ``ValueError`` if the record is truncated, has bytes left after the tree or refers to a name missing from
+    ``names``.
+    """
+    name_id = None
+    try:
+        name_id, pos = decode_varint(record, 0)
+        nchildren, pos = decode_varint(record, pos)
+        root = NodeDTO(names[name_id])
+        stack = [[root, nchildren]]
+        while stack:
+            top = stack[-1]
+            if top[1] == 0:
+                stack.pop()
+                continue
+            top[1] -= 1
+            # ids and child counts are almost always below 128, i.e. a single byte
+            name_id = record[pos]
+            if name_id < 0x80:
+                pos += 1
+            else:
+                name_id, pos = decode_varint(record, pos)
+            nchildren = record[pos]
+            if nchildren < 0x80:
+                pos += 1
+            else:
+                nchildren, pos = decode_varint(record, pos)
+            node = NodeDTO(names[name_id])
+            top[0].children.append(node)
+            if nchildren:
+                stack.append([node, nchildren])
+    except IndexError:
+        # indexing is not bounds-checked up front to keep the loop fast, the failed lookup is told apart here
+        if name_id is not None and name_id >= len(names):
+            raise ValueError(f"tree record refers to name id {name_id}, the string table has {len(names)} names") \
+                from None
+        raise ValueError("tree record is truncated") from None
+    if pos != len(record):
+        raise ValueError(f"tree record has {len(record) - pos} trailing bytes")
+    return TreeDTO(root)
+
+
+class TreeFileReader(object):
+    """Streams trees back from a ``.tgb`` file, compressed or not."""
+
+    def __init__(self, p: Path):
+        self._path = p
+        self._in: Optional[BinaryIO] = None
+        self._buf = b""
+        self._pos = 0
+        self.compression = "none"
+        self.names: List[str] = []
+
+    def __enter__(self) -> 'TreeFileReader':
+        with open(self._path, "rb") as fin:
+            lead = fin.read(len(ZSTD_MAGIC))
+        if lead.startswith(GZIP_MAGIC):
+            self.compression = "gzip"
+            self._in = gzip.open(self._path, "rb")
+        elif lead.startswith(ZSTD_MAGIC):
+            check_compression("zstd")
+            self.compression = "zstd"
+            self._in = zstandard.ZstdDecompressor().stream_reader(open(self._path, "rb"), closefd=True)
+        else:
+            self._in = open(self._path, "rb")
+
+        if self._read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{self._path} is not a tree file")
+        nnames = self._read_varint()
+        for _ in range(nnames):
+            self.names.append(self._read(self._read_varint()).decode("utf-8"))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._in.close()
+        return False
+
+    def records(self) -> Iterator[Tuple[int, bytes]]:
+        """Yields tree ids and encoded trees, as they are stored."""
+        while self._fill(1):
+            tree_id = self._read_varint()
+            record = self._read(self._read_varint())
+            yield tree_id, record
+
+    def trees(self) -> Iterator[Tuple[int, TreeDTO]]:
+        for tree_id, record in self.records():
+            yield tree_id, self.decode(record)
+
+    def decode(self, record: bytes) -> TreeDTO:
+        try:
+            return decode_tree(record, self.names)
+        except ValueError as e:
+            raise ValueError(f"{self._path}: {e}") from None
+
+    def _fill(self, size: int) -> bool:
+        """Reads the stream till ``size`` bytes are buffered, ``False`` if it ends earlier."""
+        while len(self._buf) - self._pos < size:
+            try:
+                chunk = self._in.read(max(CHUNK_SIZE, size))
+            except EOFError:
+                raise ValueError(f"{self._path} is truncated") from None
+            except CORRUPT_STREAM_ERRORS as e:
+                raise ValueError(f"{self._path} is corrupt: {e}") from None
+            if not chunk:
+                return False
+            self._buf = self._buf[self._pos:] + chunk
+            self._pos = 0
+        return True
+
+    def _read(self, size: int) -> bytes:
+        if not self._fill(size):
+            raise ValueError(f"{self._path} is truncated")
+        data = self._buf[self._pos:self._pos + size]
+        self._pos += size
+        return data
+
+    def _read_varint(self) -> int:
+        self._fill(10)
+        try:
+            value, self._pos = decode_varint(self._buf, self._pos)
+        except IndexError:
+            raise ValueError(f"{self._path} is truncated") from None
+        return value
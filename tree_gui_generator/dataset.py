@@ -0,0 +1,193 @@
+__all__ = ["DatasetStats", "shard_range", "manifest_name", "widget_index_name", "conf_hash", "snapshot_conf",
+           "read_manifest", "write_manifest", "find_manifests", "merge_manifests", "read_index"]
+
+import os
+import shutil
+from hashlib import sha256
+from pathlib import Path
+from typing import List, Tuple, Optional
+
+from tree_gui_generator.dto import DatasetStatsDTO, ManifestDTO, ShardRefDTO, DatasetIndexDTO
+from tree_gui_generator.fileproc import FileProc
+from tree_gui_generator.model import Node, Tree, Reader
+
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.json"
+WIDGET_INDEX_NAME = "widget_index.json"
+CONF_DIR_NAME = "conf"
+
+
+class DatasetStats(object):
+    """Statistics of a set of generated trees, accumulated while they are written."""
+
+    def __init__(self, dto: DatasetStatsDTO = None):
+        if dto is None:
+            dto = DatasetStatsDTO()
+        self._dto = dto
+
+    @property
+    def dto(self) -> DatasetStatsDTO:
+        return self._dto
+
+    def add_tree(self, tree: Tree):
+        self._add_tree(tree, 1)
+
+    def remove_tree(self, tree: Tree):
+        """Takes back a tree added earlier. ``NodeDTO`` trees read back from files are accepted too."""
+        self._add_tree(tree, -1)
+
+    def merge(self, other: DatasetStatsDTO):
+        dto = self._dto
+        dto.ntrees += other.ntrees
+        dto.nnodes += other.nnodes
+        for name, count in other.widgets.items():
+            dto.widgets[name] = dto.widgets.get(name, 0) + count
+        for size, count in other.sizes.items():
+            dto.sizes[size] = dto.sizes.get(size, 0) + count
+        self._update_bounds()
+
+    def _add_tree(self, tree: Tree, sign: int):
+        nnodes = self._count_nodes(tree.root, sign)
+        dto = self._dto
+        dto.ntrees += sign
+        dto.nnodes += sign * nnodes
+        size = str(nnodes)
+        dto.sizes[size] = dto.sizes.get(size, 0) + sign
+        if dto.sizes[size] == 0:
+            del dto.sizes[size]
+        self._update_bounds()
+
+    def _update_bounds(self):
+        dto = self._dto
+        sizes = [int(size) for size in dto.sizes]
+        dto.min_nodes = min(sizes, default=0)
+        dto.max_nodes = max(sizes, default=0)
+
+    def _count_nodes(self, node: Node, sign: int) -> int:
+        widgets = self._dto.widgets
+        widgets[node.name] = widgets.get(node.name, 0) + sign
+        if widgets[node.name] == 0:
+            del widgets[node.name]
+        nnodes = 1
+        for child in node.children:
+            nnodes += self._count_nodes(child, sign)
+        return nnodes
+
+    def __repr__(self):
+        dto = self._dto
+        return f"<DatasetStats -- ntrees: {dto.ntrees}, nnodes: {dto.nnodes}, min_nodes: {dto.min_nodes}, " \
+               f"max_nodes: {dto.max_nodes}>"
+
+
+def shard_range(ntrees: int, shard_index: int, shard_count: int) -> range:
+    """Tree indices generated by the shard ``shard_index`` (1-based) of ``shard_count``."""
+    return range((shard_index - 1) * ntrees // shard_count, shard_index * ntrees // shard_count)
+
+
+def manifest_name(shard_index: int, shard_count: int) -> str:
+    if shard_count == 1:
+        return MANIFEST_NAME
+    return f"manifest_{shard_index}_of_{shard_count}.json"
+
+
+def widget_index_name(shard_index: int, shard_count: int) -> str:
+    if shard_count == 1:
+        return WIDGET_INDEX_NAME
+    return f"widget_index_{shard_index}_of_{shard_count}.json"
+
+
+def conf_hash(conf_path: Path) -> str:
+    digest = sha256()
+    for path in Reader.descr_paths(conf_path):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def snapshot_conf(conf_path: Path, otp_path: Path):
+    """Copies the config the trees are generated with next to them, ``--regenerate-affected`` diffs against it."""
+    snapshot_path = otp_path / CONF_DIR_NAME
+    snapshot_path.mkdir(parents=True, exist_ok=True)
+    for path in Reader.descr_paths(conf_path):
+        shutil.copyfile(path, snapshot_path / path.name)
+
+
+def write_manifest(manifest: ManifestDTO, otp_path: Path) -> Path:
+    manifest_path = otp_path / manifest_name(manifest.shard_index, manifest.shard_count)
+    FileProc.write_json(manifest, manifest_path)
+    return manifest_path
+
+
+def read_manifest(manifest_path: Path) -> ManifestDTO:
+    d = FileProc.read_json(manifest_path)
+    d["stats"] = DatasetStatsDTO(**d["stats"])
+    return ManifestDTO(**d)
+
+
+def read_index(index_path: Path) -> DatasetIndexDTO:
+    d = FileProc.read_json(index_path)
+    d["stats"] = DatasetStatsDTO(**d["stats"])
+    d["shards"] = [ShardRefDTO(**shard) for shard in d["shards"]]
+    return DatasetIndexDTO(**d)
+
+
+def find_manifests(paths: List[Path]) -> List[Path]:
+    """Expands directories to the manifests they hold, files are taken as is."""
+    result = []
+    for path in paths:
+        if path.is_dir():
+            result.extend(sorted(path.glob("manifest*.json")))
+        else:
+            result.append(path)
+    return result
+
+
+def merge_manifests(manifest_paths: List[Path], otp_path: Path) \
+        -> Tuple[Optional[DatasetIndexDTO], List[str]]:
+    """Combines shard manifests into one dataset index.
+
+    Returns the index and a list of problems found: manifests of different runs, missing or overlapping tree ranges,
+    missing widget indexes or tree files of the shards. The index is ``None`` if there are problems.
+    """
+    problems = []
+    manifests = []
+    for path in find_manifests(manifest_paths):
+        manifests.append((path, read_manifest(path)))
+    if not manifests:
+        return None, ["no manifests found"]
+
+    _, first = manifests[0]
+    for path, manifest in manifests[1:]:
+        for attr in ("ntrees", "seed", "conf_hash", "regenerated_conf_hashes"):
+            if getattr(manifest, attr) != getattr(first, attr):
+                problems.append(f"{path}: {attr} {getattr(manifest, attr)} differs from {getattr(first, attr)}")
+
+    manifests.sort(key=lambda item: (item[1].start, item[1].stop))
+    expected_start = 0
+    for path, manifest in manifests:
+        if manifest.start > expected_start:
+            problems.append(f"missing trees [{expected_start}, {manifest.start})")
+        elif manifest.start < expected_start:
+            problems.append(f"{path}: trees [{manifest.start}, {min(manifest.stop, expected_start)}) overlap "
+                            f"with another shard")
+        expected_start = max(expected_start, manifest.stop)
+    if expected_start < first.ntrees:
+        problems.append(f"missing trees [{expected_start}, {first.ntrees})")
+
+    stats = DatasetStats()
+    shards = []
+    for path, manifest in manifests:
+        stats.merge(manifest.stats)
+        shard_dir = Path(os.path.relpath(path.parent.resolve(), otp_path.resolve()))
+        widget_index_path = shard_dir / widget_index_name(manifest.shard_index, manifest.shard_count)
+        if not (path.parent / widget_index_path.name).is_file():
+            problems.append(f"{path}: widget index {path.parent / widget_index_path.name} not found")
+        trees_path = None if manifest.trees_path is None else (shard_dir / manifest.trees_path).as_posix()
+        if trees_path is not None and not (path.parent / manifest.trees_path).is_file():
+            problems.append(f"{path}: tree file {path.parent / manifest.trees_path} not found")
+        shards.append(ShardRefDTO(manifest.shard_index, manifest.start, manifest.stop, shard_dir.as_posix(),
+                                  widget_index_path.as_posix(), manifest.tree_format, trees_path))
+
+    if problems:
+        return None, problems
+    return DatasetIndexDTO(first.ntrees, first.seed, first.conf_hash, shards, stats.dto,
+                           first.regenerated_conf_hashes), problems
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Dict
 
 
 class BaseWidgetDTO:
@@ -80,3 +80,69 @@ class NodeDTO(object):
 class TreeDTO(object):
     def __init__(self, root: 'NodeDTO'):
         self.root = root
+
+
+class DatasetStatsDTO(object):
+    def __init__(self, ntrees: int = 0, nnodes: int = 0, min_nodes: int = 0, max_nodes: int = 0,
+                 widgets: Dict[str, int] = None, sizes: Dict[str, int] = None):
+        if widgets is None:
+            widgets = {}
+        if sizes is None:
+            sizes = {}
+        self.ntrees = ntrees
+        self.nnodes = nnodes
+        self.min_nodes = min_nodes
+        self.max_nodes = max_nodes
+        self.widgets = widgets
+        self.sizes = sizes
+
+
+class ManifestDTO(object):
+    def __init__(self, ntrees: int, seed: int, conf_hash: str, shard_index: int, shard_count: int, start: int,
+                 stop: int, stats: 'DatasetStatsDTO', tree_format: str = "json", trees_path: str = None,
+                 regenerated_conf_hashes: List[str] = None):
+        if regenerated_conf_hashes is None:
+            regenerated_conf_hashes = []
+        self.ntrees = ntrees
+        self.seed = seed
+        self.conf_hash = conf_hash
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.start = start
+        self.stop = stop
+        self.stats = stats
+        self.tree_format = tree_format
+        self.trees_path = trees_path
+        self.regenerated_conf_hashes = regenerated_conf_hashes
+
+
+class ShardRefDTO(object):
+    def __init__(self, shard_index: int, start: int, stop: int, path: str, widget_index: str,
+                 tree_format: str = "json", trees_path: str = None):
+        self.shard_index = shard_index
+        self.start = start
+        self.stop = stop
+        self.path = path
+        self.widget_index = widget_index
+        self.tree_format = tree_format
+        self.trees_path = trees_path
+
+
+class DatasetIndexDTO(object):
+    def __init__(self, ntrees: int, seed: int, conf_hash: str, shards: List['ShardRefDTO'],
+                 stats: 'DatasetStatsDTO', regenerated_conf_hashes: List[str] = None):
+        if regenerated_conf_hashes is None:
+            regenerated_conf_hashes = []
+        self.ntrees = ntrees
+        self.seed = seed
+        self.conf_hash = conf_hash
+        self.shards = shards
+        self.stats = stats
+        self.regenerated_conf_hashes = regenerated_conf_hashes
+
+
+class WidgetIndexDTO(object):
+    def __init__(self, start: int, stop: int, keys: Dict[str, str]):
+        self.start = start
+        self.stop = stop
+        self.keys = keys
@@ -1,24 +1,45 @@
 __all__ = ["generate_trees", "generate_trees"]
 
 import argparse
+import os
 import sys
-from collections import namedtuple
+from collections import namedtuple, Counter
+from functools import lru_cache
 from pathlib import Path
-from random import choices, randrange
+from random import choices, randrange, seed as random_seed
+from time import perf_counter
 from typing import List, Dict, Set, Tuple, Optional
 
+from tree_gui_generator.codec import TreeFileWriter, TreeFileReader, JsonTreeWriter, tree_path, trees_file_name, \
+    check_compression, COMPRESSIONS
+from tree_gui_generator.dataset import DatasetStats, shard_range, widget_index_name, conf_hash, snapshot_conf, \
+    read_manifest, write_manifest, find_manifests, merge_manifests, INDEX_NAME, WIDGET_INDEX_NAME, CONF_DIR_NAME
+from tree_gui_generator.dto import ManifestDTO, TreeDTO
 from tree_gui_generator.fileproc import FileProc, PROJ_ROOT_DIR
 from tree_gui_generator.model import ContWidget, Node, \
-    CompWidgetContent, Tree, Descriptions, DTOMapper
+    CompWidgetContent, Tree, Descriptions, NodePool, Reader
+from tree_gui_generator.runtime import GCControl, peak_rss_kb
+from tree_gui_generator.validator import validate_paths, resolve_sources
+from tree_gui_generator.widget_index import WidgetIndex, tree_keys, changed_widget_keys
 
 DESCR_DIR_PATH = PROJ_ROOT_DIR / "resources/configs/cut_configs/__current__almost_ok"
 OTP_PATH = PROJ_ROOT_DIR / "resources/generated_trees"
+GC_INTERVAL = 1000
 
 WidgetInfo = namedtuple("WidgetInfo", ["prob", "solo"])
 NodeInfo = namedtuple("NodeInfo", ["node", "type"])
 
+# nodes of the tree being built, released after the tree is serialized
+node_pool = NodePool()
+
 
 # building tree --------------------------------------------------------------------------------------------------------
+def generate_indexed_tree(itree: int, seed: int, descrs: Descriptions) -> Tuple[Tree, List[Node]]:
+    random_seed(f"{seed}:{itree}")
+    nwidgets = randrange(descrs.tree.min_nwidgets, descrs.tree.max_nwidgets)
+    return generate_tree(nwidgets, descrs)
+
+
 def generate_tree(nwidgets: int, descrs: Descriptions) -> Tuple[Tree, List[Node]]:
     nodes = sample(descrs.tree.root, nwidgets, descrs)
     tree = build_tree(nodes, descrs)
@@ -62,15 +83,12 @@ def get_cont_subtrees(nodes: List[Node], descrs: Descriptions) -> List[
 
 
 def has_container_as_child(node: 'Node', descrs: Descriptions) -> bool:
-    def find_cont(node_: 'Node'):
-        for child in node_.children:
-            if child.name in descrs.cont.keys():
-                return True
-            elif child.name in descrs.comp.keys():
-                find_cont(child)
-        return False
-
-    return find_cont(node)
+    for child in node.children:
+        if child.name in descrs.cont.keys():
+            return True
+        elif child.name in descrs.comp.keys():
+            has_container_as_child(child, descrs)
+    return False
 
 
 def link_two_rand_container_subtrees(cont_subtrees: List['Node'], descrs: Descriptions):
@@ -98,19 +116,8 @@ def link_two_rand_container_subtrees(cont_subtrees: List['Node'], descrs: Descri
 
 def add_child(parent: 'Node', child: 'Node', descrs: Descriptions) \
         -> Tuple[bool, Optional['Node']]:
-    def find_potent_parents(parent_: 'Node', pot_parents: List['Node']):
-        if parent_.name in descrs.cont.keys() and child.name in descrs.cont[parent_.name].children:
-            pot_parents.append(parent_)
-        elif parent_.name in descrs.comp.keys():
-            for comps_child in parent_.children:
-                if comps_child.name in descrs.comp:
-                    find_potent_parents(comps_child, pot_parents)
-                elif comps_child.name in descrs.cont:
-                    if child.name in descrs.cont[comps_child.name].children:
-                        pot_parents.append(comps_child)
-
     potent_parents = []
-    find_potent_parents(parent, potent_parents)
+    find_potent_parents(parent, child, potent_parents, descrs)
     if potent_parents:
         chosen_parent = choices(potent_parents, k=1)[0]
         chosen_parent.children.append(child)
@@ -120,6 +127,18 @@ def add_child(parent: 'Node', child: 'Node', descrs: Descriptions) \
         return False, None
 
 
+def find_potent_parents(parent: 'Node', child: 'Node', pot_parents: List['Node'], descrs: Descriptions):
+    if parent.name in descrs.cont.keys() and child.name in descrs.cont[parent.name].children:
+        pot_parents.append(parent)
+    elif parent.name in descrs.comp.keys():
+        for comps_child in parent.children:
+            if comps_child.name in descrs.comp:
+                find_potent_parents(comps_child, child, pot_parents, descrs)
+            elif comps_child.name in descrs.cont:
+                if child.name in descrs.cont[comps_child.name].children:
+                    pot_parents.append(comps_child)
+
+
 def can_be_parent_child(parent: 'Node', child: 'Node', descrs: Descriptions):
     if child.name == descrs.tree.root:
         return False
@@ -163,18 +182,19 @@ def link_only_cont_children(target_node: Node, cont_subtrees: List['Node'], cont
 
 
 def get_all_comp_containers(node: 'Node', descrs: Descriptions) -> List[Node]:
-    def find_cont(node_: 'Node'):
-        for child in node_.children:
-            if child.name in descrs.cont.keys():
-                res.append(child)
-            elif child.name in descrs.comp.keys():
-                find_cont(child)
-
     res = []
-    find_cont(node)
+    find_comp_containers(node, res, descrs)
     return res
 
 
+def find_comp_containers(node: 'Node', res: List['Node'], descrs: Descriptions):
+    for child in node.children:
+        if child.name in descrs.cont.keys():
+            res.append(child)
+        elif child.name in descrs.comp.keys():
+            find_comp_containers(child, res, descrs)
+
+
 def link_to_rand_container_node(cont_tree_nodes: List[Node], atomic_tree_nodes: List[Node],
                                 descrs: Descriptions):
     parent_index: int = randrange(0, len(cont_tree_nodes))
@@ -198,34 +218,37 @@ def link_to_rand_container_node(cont_tree_nodes: List[Node], atomic_tree_nodes:
                 excess_children_count -= 1
 
 
-def remove_empty_containers(tree: 'Node', descrs: Descriptions):
-    def traversal(node: Node):
-        node_child_index = 0
-        while node_child_index < len(node.children):
-            node_child = node.children[node_child_index]
-            if node_child in descrs.cont or node_child in descrs.comp:
-                traversal(node_child)
-            if node_child in descrs.cont and not node_child.children:
-                node.children.pop(node_child_index)
-                node_child_index -= 1
-            node_child_index += 1
-
-    traversal(tree)
+def remove_empty_containers(node: 'Node', descrs: Descriptions):
+    node_child_index = 0
+    while node_child_index < len(node.children):
+        node_child = node.children[node_child_index]
+        if node_child in descrs.cont or node_child in descrs.comp:
+            remove_empty_containers(node_child, descrs)
+        if node_child in descrs.cont and not node_child.children:
+            node.children.pop(node_child_index)
+            node_child_index -= 1
+        node_child_index += 1
 
 
 # create sample --------------------------------------------------------------------------------------------------------
-def sample(root_name: str, nwidgets: int, descrs: Descriptions) -> List[Node]:
+@lru_cache(maxsize=8)
+def get_general_domain(descrs: Descriptions) -> Dict[str, WidgetInfo]:
     general_domain: Dict[str, WidgetInfo] = {name: WidgetInfo(w.prob, w.solo)
                                              for name, w in descrs.atomic.items()}
     general_domain.update({name: WidgetInfo(w.prob, w.solo)
                            for name, w in descrs.comp.items()})
     general_domain.update({name: WidgetInfo(w.prob, w.solo)
                            for name, w in descrs.cont.items()})
+    return general_domain
+
+
+def sample(root_name: str, nwidgets: int, descrs: Descriptions) -> List[Node]:
+    general_domain: Dict[str, WidgetInfo] = get_general_domain(descrs)
 
     current_domain: Dict[str, WidgetInfo] = {root_name: general_domain[root_name]}
     sampled_widget: Set[str] = {root_name}
 
-    root_node = Node(root_name)
+    root_node = create_node(root_name)
     if root_name in descrs.comp.keys():
         root_node = create_comp_node(root_name, descrs)
     update_domain(current_domain, general_domain, root_node, descrs)
@@ -290,14 +313,15 @@ def create_comp_node(comp_name: str, descrs: Descriptions) -> Node:
             content_node = create_node(content_name)
         children.append(content_node)
 
-    comp_node = Node(comp_widget.name, children=children)
+    comp_node = create_node(comp_widget.name)
+    comp_node.add_children(children)
     for child in children:
         child.parent = comp_node
     return comp_node
 
 
 def create_node(widget_name):
-    return Node(widget_name)
+    return node_pool.acquire(widget_name)
 
 
 def gen_comp_node_content(cont_items: List[CompWidgetContent]):
@@ -308,14 +332,173 @@ def gen_comp_node_content(cont_items: List[CompWidgetContent]):
 
 
 # main -----------------------------------------------------------------------------------------------------
-def generate_trees(ntrees: int, otp_path: Path, descrs: Descriptions):
-    for itree in range(ntrees):
-        nwidgets = randrange(descrs.tree.min_nwidgets, descrs.tree.max_nwidgets)
-        tree, nodes = generate_tree(nwidgets, descrs)
-        print_info(tree, nodes)
+def generate_trees(ntrees: int, otp_path: Path, descrs: Descriptions, gc_interval: int = GC_INTERVAL,
+                   seed: Optional[int] = None, shard: Tuple[int, int] = (1, 1), tree_format: str = "json",
+                   compression: str = "none"):
+    """Generates trees of the ``shard`` (index, count) slice of a ``ntrees`` dataset.
+
+    Every tree is seeded from ``seed`` and its index only, so the union of all shards run with the same seed is equal
+    to an unsharded run. Trees are written to ``tree<N>.json`` files or, for the ``bin`` format, to one ``.tgb`` file.
+    """
+    if seed is None:
+        seed = randrange(2 ** 32)
+    shard_index, shard_count = shard
+    itrees = shard_range(ntrees, shard_index, shard_count)
+    stats = DatasetStats()
+    index = WidgetIndex(itrees.start, itrees.stop)
+    if tree_format == "bin":
+        trees_name = trees_file_name(shard_index, shard_count, compression)
+        tree_writer = TreeFileWriter(otp_path / trees_name, widget_names(descrs), compression)
+    else:
+        trees_name = None
+        tree_writer = JsonTreeWriter(otp_path)
+
+    with GCControl(gc_interval) as gc_control, tree_writer:
+        for itree in itrees:
+            tree, nodes = generate_indexed_tree(itree, seed, descrs)
+            print_info(tree, nodes)
+            stats.add_tree(tree)
+            index.add_tree(itree, tree_keys(tree.root, descrs))
+
+            tree_writer.write(itree, tree)
+            node_pool.release_all()
+            gc_control.safe_point()
+
+    manifest = ManifestDTO(ntrees, seed, conf_hash(descrs.path), shard_index, shard_count, itrees.start, itrees.stop,
+                           stats.dto, tree_format, trees_name)
+    write_manifest(manifest, otp_path)
+    index.write(otp_path / widget_index_name(shard_index, shard_count))
+    snapshot_conf(descrs.path, otp_path)
+    print_run_info(len(itrees), gc_control, stats)
+    print(index)
+
+
+def regenerate_affected(otp_path: Path, descrs: Descriptions, gc_interval: int = GC_INTERVAL):
+    """Regenerates in place the trees of ``otp_path`` that use widgets changed since the trees were generated.
+
+    A regenerated tree keeps its seed, so it becomes the same tree a full run with the new config would give. Trees
+    using none of the changed widgets are left untouched and stay the output of the old config. That is why the
+    manifest keeps the original ``conf_hash`` and the new one is appended to ``regenerated_conf_hashes``.
+    """
+    old_descrs = Descriptions(otp_path / CONF_DIR_NAME)
+    changed_keys = changed_widget_keys(old_descrs.path, descrs.path)
+    new_conf_hash = conf_hash(descrs.path)
+
+    with GCControl(gc_interval) as gc_control:
+        for manifest_path in find_manifests([otp_path]):
+            manifest = read_manifest(manifest_path)
+            index_path = otp_path / widget_index_name(manifest.shard_index, manifest.shard_count)
+            index = WidgetIndex.read(index_path)
+            if changed_keys is None:
+                affected = range(manifest.start, manifest.stop)
+            else:
+                affected = index.trees_with(changed_keys)
+
+            stats = DatasetStats(manifest.stats)
+            postings: Dict[str, Set[int]] = {}
+            if manifest.tree_format == "bin":
+                affected_set = set(affected)
+                trees_path = otp_path / manifest.trees_path
+                tmp_path = trees_path.with_name(trees_path.name + ".tmp")
+                with TreeFileReader(trees_path) as reader:
+                    names = reader.names + [name for name in widget_names(descrs) if name not in reader.names]
+                    with TreeFileWriter(tmp_path, names, reader.compression) as writer:
+                        for itree, record in reader.records():
+                            if itree not in affected_set:
+                                writer.write_record(itree, record)
+                                continue
+                            tree = regenerate_tree(itree, reader.decode(record), manifest.seed, descrs, old_descrs,
+                                                   stats, index, postings)
+                            writer.write(itree, tree)
+                            node_pool.release_all()
+                            gc_control.safe_point()
+                os.replace(tmp_path, trees_path)
+            else:
+                tree_writer = JsonTreeWriter(otp_path)
+                for itree in affected:
+                    old_tree = Reader.read_tree(tree_path(otp_path, itree))
+                    tree = regenerate_tree(itree, old_tree, manifest.seed, descrs, old_descrs, stats, index, postings)
+                    tree_writer.write(itree, tree)
+                    node_pool.release_all()
+                    gc_control.safe_point()
+
+            for key, ids in postings.items():
+                index.set_ids(key, sorted(ids))
+            index.write(index_path)
+            last_conf_hash = manifest.regenerated_conf_hashes[-1] if manifest.regenerated_conf_hashes \
+                else manifest.conf_hash
+            if new_conf_hash != last_conf_hash:
+                manifest.regenerated_conf_hashes.append(new_conf_hash)
+            write_manifest(manifest, otp_path)
+            print(f"{manifest_path.name}: regenerated {len(affected)} of {manifest.stop - manifest.start} trees")
+
+    snapshot_conf(descrs.path, otp_path)
+
+
+def regenerate_tree(itree: int, old_tree: TreeDTO, seed: int, descrs: Descriptions, old_descrs: Descriptions,
+                    stats: DatasetStats, index: WidgetIndex, postings: Dict[str, Set[int]]) -> Tree:
+    """Generates the tree ``itree`` anew and moves its stats and index entries from ``old_tree`` to it.
+
+    Changed index keys are collected in ``postings`` and have to be written back to ``index`` by the caller.
+    """
+    stats.remove_tree(old_tree)
+    tree, nodes = generate_indexed_tree(itree, seed, descrs)
+    stats.add_tree(tree)
+
+    old_keys = tree_keys(old_tree.root, old_descrs)
+    new_keys = tree_keys(tree.root, descrs)
+    for key in old_keys - new_keys:
+        get_postings(postings, index, key).discard(itree)
+    for key in new_keys - old_keys:
+        get_postings(postings, index, key).add(itree)
+    return tree
+
+
+def get_postings(postings: Dict[str, Set[int]], index: WidgetIndex, key: str) -> Set[int]:
+    ids = postings.get(key)
+    if ids is None:
+        ids = postings[key] = set(index.ids(key))
+    return ids
+
+
+def widget_names(descrs: Descriptions) -> List[str]:
+    return sorted(set(descrs.atomic).union(descrs.comp, descrs.cont))
+
+
+def convert_trees(trees_paths: List[Path], otp_path: Path) -> bool:
+    """Converts ``.tgb`` files back to ``tree<N>.json`` files. Trees read before a broken record are kept."""
+    ok = True
+    for trees_path in trees_paths:
+        ntrees = 0
+        try:
+            with TreeFileReader(trees_path) as reader:
+                for itree, tree_dto in reader.trees():
+                    FileProc.write_json(tree_dto, tree_path(otp_path, itree))
+                    ntrees += 1
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            ok = False
+        print(f"{trees_path}: {ntrees} trees -> {otp_path}")
+    return ok
+
+
+def merge_shards(manifest_paths: List[Path], otp_path: Path) -> bool:
+    index, problems = merge_manifests(manifest_paths, otp_path)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if index is None:
+        return False
 
-        tree_dto = DTOMapper.map_tree_dto(tree)
-        FileProc.write_json(tree_dto, otp_path / f"tree{itree + 1}.json")
+    # shard paths in the index are relative to otp_path, it must exist to resolve them
+    otp_path.mkdir(parents=True, exist_ok=True)
+    # index.json is written last, so a failed merge leaves no index pointing to a half-merged dataset
+    widget_index = WidgetIndex(0, index.ntrees)
+    for shard in index.shards:
+        widget_index.merge(WidgetIndex.read(otp_path / shard.widget_index))
+    widget_index.write(otp_path / WIDGET_INDEX_NAME)
+    FileProc.write_json(index, otp_path / INDEX_NAME)
+    print(f"merged {len(index.shards)} shards, {index.stats.ntrees} trees -> {otp_path / INDEX_NAME}")
+    return True
 
 
 def print_info(tree: Tree, nodes: List['Node']):
@@ -325,22 +508,193 @@ def print_info(tree: Tree, nodes: List['Node']):
     print('<------ Nodes ------>')
 
 
+def print_run_info(ntrees: int, gc_control: GCControl, stats: DatasetStats):
+    max_rss = peak_rss_kb()
+    print(f"\n<------ Run ------> ntrees: {ntrees}")
+    print(f"peak RSS: {'n/a' if max_rss is None else f'{max_rss} KiB'}")
+    print(gc_control)
+    print(node_pool)
+    print(stats)
+    print('<------ Run ------>')
+
+
+def __parse_shard(value: str) -> Tuple[int, int]:
+    try:
+        shard_index, shard_count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like i/N, got '{value}'")
+    if not 1 <= shard_index <= shard_count:
+        raise argparse.ArgumentTypeError(f"shard index must be in [1, {shard_count}], got {shard_index}")
+    return shard_index, shard_count
+
+
 def __parse_args(args=sys.argv[1:]):
     parser = argparse.ArgumentParser(
         description=sys.modules[__name__].__doc__)
 
-    parser.add_argument("ntrees", type=int, help="number of tree to generate")
+    parser.add_argument("ntrees", type=int, nargs="?", help="number of tree to generate")
     parser.add_argument("--conf", type=str, default=str(DESCR_DIR_PATH),
                         help="config directory path")
     parser.add_argument("--otp", type=str, default=str(OTP_PATH),
                         help="directory where generated trees are placed")
+    parser.add_argument("--gc-interval", type=int, default=GC_INTERVAL,
+                        help="number of trees between explicit garbage collections, 0 -- never collect")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="base seed of the dataset, random if omitted")
+    parser.add_argument("--shard", type=__parse_shard, default=None, metavar="i/N",
+                        help="generate only the i-th (1-based) of N slices of tree indices, requires --seed")
+    parser.add_argument("--regenerate-affected", action="store_true",
+                        help="regenerate in place only the trees in --otp that use widgets changed in --conf "
+                             "since they were generated")
+    parser.add_argument("--format", type=str, default=None, choices=["json", "bin"], dest="tree_format",
+                        help="json (default) -- a file per tree, bin -- all trees in one binary .tgb file")
+    parser.add_argument("--compress", type=str, default=None, choices=list(COMPRESSIONS),
+                        help="stream compression of the bin format, none by default, zstd needs the 'zstandard' "
+                             "package")
+
+    options = parser.parse_args(args)
+    if options.regenerate_affected:
+        # the dataset layout and seeds are taken from the manifests in --otp
+        given = [option for option, value in (("ntrees", options.ntrees), ("--seed", options.seed),
+                                              ("--shard", options.shard), ("--format", options.tree_format),
+                                              ("--compress", options.compress)) if value is not None]
+        if given:
+            parser.error(f"{', '.join(given)} can't be used with --regenerate-affected")
+        otp_path = Path(options.otp)
+        if not (otp_path / CONF_DIR_NAME).is_dir():
+            parser.error(f"config snapshot {otp_path / CONF_DIR_NAME} not found, --otp must be a directory "
+                         f"generated by this version")
+        if not find_manifests([otp_path]):
+            parser.error(f"no manifests found in {otp_path}")
+        return options
+
+    if options.ntrees is None:
+        parser.error("the following arguments are required: ntrees")
+    if options.shard is None:
+        options.shard = (1, 1)
+    if options.tree_format is None:
+        options.tree_format = "json"
+    if options.compress is None:
+        options.compress = "none"
+    if options.compress != "none" and options.tree_format != "bin":
+        parser.error("--compress is supported by the bin format only")
+    try:
+        check_compression(options.compress)
+    except RuntimeError as e:
+        parser.error(str(e))
+    if options.shard[1] > 1 and options.seed is None:
+        parser.error("--shard requires --seed, otherwise shards don't add up to one dataset")
+    return options
+
+
+def __parse_merge_args(args):
+    parser = argparse.ArgumentParser(
+        prog="treegen.py merge",
+        description="combine shard manifests into one dataset index")
+
+    parser.add_argument("manifests", type=str, nargs="+",
+                        help="shard manifests or directories holding them")
+    parser.add_argument("--otp", type=str, default=str(OTP_PATH),
+                        help=f"directory where {INDEX_NAME} is placed")
+
+    return parser.parse_args(args)
+
+
+def validate_trees(paths: List[Path], conf_path: Path, jobs: int, batch_size: int, max_report: int) -> bool:
+    started_at = perf_counter()
+    try:
+        ntrees, violations, problems = validate_paths(paths, conf_path, jobs, batch_size)
+    except ValueError as e:
+        # a broken index.json or manifest, there is no list of trees to check
+        print(e, file=sys.stderr)
+        return False
+    elapsed = perf_counter() - started_at
+    if ntrees == 0:
+        problems.append(f"no trees found in {', '.join(str(path) for path in paths)}")
+
+    for violation in violations[:max_report]:
+        print(f"{violation.source}: [{violation.rule}] {violation.message}")
+    if len(violations) > max_report:
+        print(f"... {len(violations) - max_report} more")
+    for problem in problems:
+        print(problem)
+
+    nbad_trees = len({violation.source for violation in violations})
+    print(f"\n<------ Validation ------> checked {ntrees} trees in {elapsed:.1f} s, "
+          f"{len(violations)} violations in {nbad_trees} trees, {len(problems)} dataset problems")
+    for rule, count in Counter(violation.rule for violation in violations).most_common():
+        print(f"{rule}: {count}")
+    print('<------ Validation ------>')
+    return not violations and not problems
+
+
+def __parse_convert_args(args):
+    parser = argparse.ArgumentParser(
+        prog="treegen.py convert",
+        description="convert binary .tgb tree files to tree<N>.json files")
+
+    parser.add_argument("trees", type=str, nargs="+",
+                        help=".tgb files, compressed or not")
+    parser.add_argument("--otp", type=str, default=str(OTP_PATH),
+                        help="directory where json trees are placed")
 
     return parser.parse_args(args)
 
+
+def __parse_validate_args(args):
+    parser = argparse.ArgumentParser(
+        prog="treegen.py validate",
+        description="check that generated trees obey the config grammar")
+
+    parser.add_argument("paths", type=str, nargs="+",
+                        help=f"dataset roots or their {INDEX_NAME}, output directories (json trees and/or .tgb files) "
+                             f"or .tgb files")
+    parser.add_argument("--conf", type=str, default=None,
+                        help=f"config directory path, by default the '{CONF_DIR_NAME}' snapshot next to the first "
+                             f"trees")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    parser.add_argument("--batch-size", type=int, default=1000,
+                        help="number of trees sent to a worker at once")
+    parser.add_argument("--max-report", type=int, default=100,
+                        help="number of violations printed")
+
+    options = parser.parse_args(args)
+    for path in options.paths:
+        if not Path(path).exists():
+            parser.error(f"{path} not found")
+    if options.conf is None:
+        # a dataset root holds no snapshot itself, its shards do
+        first_path = resolve_sources([Path(options.paths[0])])[0].path
+        options.conf = str((first_path if first_path.is_dir() else first_path.parent) / CONF_DIR_NAME)
+    if not Path(options.conf).is_dir():
+        parser.error(f"config directory {options.conf} not found, pass --conf")
+    return options
+
+
 def main():
-    options = __parse_args()
+    args = sys.argv[1:]
+    if args[:1] == ["validate"]:
+        options = __parse_validate_args(args[1:])
+        ok = validate_trees([Path(path) for path in options.paths], Path(options.conf), options.jobs,
+                            options.batch_size, options.max_report)
+        sys.exit(0 if ok else 1)
+    if args[:1] == ["merge"]:
+        options = __parse_merge_args(args[1:])
+        ok = merge_shards([Path(path) for path in options.manifests], Path(options.otp))
+        sys.exit(0 if ok else 1)
+    if args[:1] == ["convert"]:
+        options = __parse_convert_args(args[1:])
+        ok = convert_trees([Path(path) for path in options.trees], Path(options.otp))
+        sys.exit(0 if ok else 1)
+
+    options = __parse_args(args)
     descr = Descriptions(Path(options.conf))
     otp = Path(options.otp)
+    if options.regenerate_affected:
+        regenerate_affected(otp, descr, options.gc_interval)
+        return
 
     ntrees = options.ntrees
-    generate_trees(ntrees, otp, descr)
+    generate_trees(ntrees, otp, descr, options.gc_interval, options.seed, options.shard, options.tree_format,
+                   options.compress)
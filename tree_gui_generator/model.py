@@ -1,4 +1,4 @@
-__all__ = ['Descriptions']
+__all__ = ['Descriptions', 'NodePool']
 from pathlib import Path
 from typing import List, Dict, Tuple
 
@@ -127,22 +127,25 @@ class Tree(object):
     def root(self) -> 'Node':
         return self._root
 
-    def __repr__(self):
-        def dfs(node: Node, level: int) -> None:
-            result_string_list.append(("    " * level)
-                                      + f"<level {level}>::{node.__str__()}"
-                                      + f"::<amount of children {len(node.children)}>")
-            for child_node in node.children:
-                dfs(child_node, level + 1)
+    @classmethod
+    def _repr_dfs(cls, node: 'Node', level: int, result_string_list: List[str]) -> None:
+        result_string_list.append(("    " * level)
+                                  + f"<level {level}>::{node.__str__()}"
+                                  + f"::<amount of children {len(node.children)}>")
+        for child_node in node.children:
+            cls._repr_dfs(child_node, level + 1, result_string_list)
 
+    def __repr__(self):
         obj_marker = f"<------ Tree ------>"
         result_string_list = [obj_marker]
-        dfs(self.root, 0)
+        self._repr_dfs(self.root, 0, result_string_list)
         result_string_list.append(obj_marker + f" nwidget: {len(result_string_list) - 1}")
         return '\n'.join(result_string_list)
 
 
 class Node(object):
+    __slots__ = ("_name", "_children", "_parent")
+
     def __init__(self, name: str, parent: 'Node' = None, children: List['Node'] = None):
         if children is None:
             children = []
@@ -193,6 +196,50 @@ class Node(object):
         return f'<Node -- name: {self._name}>'
 
 
+class NodePool(object):
+    """Free-list of nodes recycled between trees.
+
+    Nodes handed out by ``acquire`` stay owned by the pool until ``release_all`` is called, after that they (and their
+    ``children`` lists) are reused for the next tree. Released nodes are unlinked, so parent <-> child reference
+    cycles never reach the cyclic garbage collector.
+    """
+
+    def __init__(self):
+        self._free: List[Node] = []
+        self._used: List[Node] = []
+        self._nallocated = 0
+        self._nreused = 0
+
+    @property
+    def nallocated(self) -> int:
+        return self._nallocated
+
+    @property
+    def nreused(self) -> int:
+        return self._nreused
+
+    def acquire(self, name: str) -> Node:
+        if self._free:
+            node = self._free.pop()
+            node._name = name
+            self._nreused += 1
+        else:
+            node = Node(name)
+            self._nallocated += 1
+        self._used.append(node)
+        return node
+
+    def release_all(self):
+        for node in self._used:
+            node._children.clear()
+            node._parent = None
+        self._free.extend(self._used)
+        self._used.clear()
+
+    def __repr__(self):
+        return f"<NodePool -- allocated: {self._nallocated}, reused: {self._nreused}, free: {len(self._free)}>"
+
+
 class Descriptions(object):
     def __init__(self, path):
         atomic_list, comp_list, cont_list, self.tree \
@@ -200,6 +247,7 @@ class Descriptions(object):
         self.atomic = {item.name: item for item in atomic_list}
         self.comp = {item.name: item for item in comp_list}
         self.cont = {item.name: item for item in cont_list}
+        self.path = path
 
 
 class DTOMapper(object):
@@ -229,15 +277,16 @@ class DTOMapper(object):
         return TreeDescr(dto.root, dto.min_nwidgets, dto.max_nwidgets)
 
     @classmethod
-    def map_tree_dto(cls, tree: Tree) -> TreeDTO:
-        def dfs(node: 'Node') -> NodeDTO:
-            node_dto = NodeDTO(node.name)
-            for child in node.children:
-                child_dto = dfs(child)
-                node_dto.children.append(child_dto)
-            return node_dto
+    def map_node_dto(cls, node: 'Node') -> NodeDTO:
+        node_dto = NodeDTO(node.name)
+        for child in node.children:
+            child_dto = cls.map_node_dto(child)
+            node_dto.children.append(child_dto)
+        return node_dto
 
-        root_dto = dfs(tree.root)
+    @classmethod
+    def map_tree_dto(cls, tree: Tree) -> TreeDTO:
+        root_dto = cls.map_node_dto(tree.root)
         return TreeDTO(root_dto)
 
 
@@ -247,6 +296,11 @@ class Reader(object):
     _CONTAINER = Path("cont_widget_descr.json")
     _TREE_DESCR = Path("tree_descr.json")
 
+    @classmethod
+    def descr_paths(cls, dir_path: Path) -> List[Path]:
+        return [dir_path / cls._ATOMIC, dir_path / cls._COMPOSITE, dir_path / cls._CONTAINER,
+                dir_path / cls._TREE_DESCR]
+
     @classmethod
     def __comp_list_json_reader_hook(cls, d: Dict):
         try:
@@ -272,6 +326,10 @@ class Reader(object):
         tree_descr = DTOMapper.map_tree_descr(tree_descr_dto)
         return atomic_list, comp_list, cont_list, tree_descr
 
+    @classmethod
+    def read_tree(cls, file_path: Path) -> TreeDTO:
+        return FileProc.read_json(file_path, obj_hook=lambda d: TreeDTO(**d) if "root" in d else NodeDTO(**d))
+
 
 class Writer(object):
     @classmethod
@@ -0,0 +1,72 @@
+__all__ = ["GCControl", "peak_rss_kb"]
+
+import gc
+import sys
+from time import perf_counter
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Peak resident set size of the current process in KiB, ``None`` if the platform can't tell."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        max_rss //= 1024
+    return max_rss
+
+
+class GCControl(object):
+    """Runs a block with the cyclic garbage collector under explicit control.
+
+    On enter everything allocated so far (configs, caches) is collected once and moved to the permanent generation,
+    then automatic collection is disabled. The loop is expected to call ``safe_point`` after each item, a collection
+    is made every ``interval`` calls. Pause time of every collection, explicit or not, is accumulated.
+    """
+
+    def __init__(self, interval: int):
+        self._interval = interval
+        self._ncalls = 0
+        self._was_enabled = False
+        self._started_at = 0.0
+        self.ncollections = 0
+        self.pause_total = 0.0
+        self.pause_max = 0.0
+
+    def __enter__(self) -> 'GCControl':
+        self._was_enabled = gc.isenabled()
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        gc.callbacks.append(self._on_gc)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        gc.callbacks.remove(self._on_gc)
+        gc.unfreeze()
+        if self._was_enabled:
+            gc.enable()
+        return False
+
+    def safe_point(self):
+        self._ncalls += 1
+        if self._interval > 0 and self._ncalls % self._interval == 0:
+            gc.collect()
+
+    def _on_gc(self, phase: str, info: dict):
+        if phase == "start":
+            self._started_at = perf_counter()
+        else:
+            pause = perf_counter() - self._started_at
+            self.ncollections += 1
+            self.pause_total += pause
+            self.pause_max = max(self.pause_max, pause)
+
+    def __repr__(self):
+        return f"<GCControl -- collections: {self.ncollections}, pause total: {self.pause_total * 1000:.2f} ms, " \
+               f"pause max: {self.pause_max * 1000:.2f} ms>"
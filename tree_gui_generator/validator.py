@@ -0,0 +1,316 @@
+__all__ = ["RuleIndex", "Violation", "TreeSource", "resolve_sources", "validate_paths"]
+
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import List, Dict, Tuple, Iterator, Iterable, Callable
+
+from tree_gui_generator.codec import TreeFileReader, decode_tree, is_trees_file
+from tree_gui_generator.dataset import INDEX_NAME, read_index, read_manifest, find_manifests
+from tree_gui_generator.dto import TreeDTO, NodeDTO
+from tree_gui_generator.model import Descriptions, Reader
+
+# tree_id is 0-based as in manifests, source names the tree for people: its json file or .tgb file and 1-based number
+Violation = namedtuple("Violation", ["tree_id", "source", "rule", "message"])
+# trees of one json shard directory or one .tgb file, expected are the tree ids its manifest declares, if any
+TreeSource = namedtuple("TreeSource", ["path", "tree_format", "expected"])
+
+TREE_FILE_RE = re.compile(r"tree(\d+)\.json$")
+MAX_DUPLICATES_REPORT = 10
+
+
+class RuleIndex(object):
+    """Grammar of the trees compiled from a config into plain sets and dicts for fast checking.
+
+    Rules:
+
+    * ``root`` -- the root is ``TreeDescr.root``;
+    * ``unknown`` -- every widget is described in the config;
+    * ``atomic`` -- atomic widgets have no children;
+    * ``cont-child`` -- children of a container are listed in its ``children``;
+    * ``cont-size`` -- a container holds no more than ``nrows * ncols`` children;
+    * ``comp-content`` -- a composite has one child per content group, chosen from that group;
+    * ``solo`` -- solo widgets appear once per tree;
+    * ``size`` -- the number of widgets, not counting composite content, is in ``[min_nwidgets, max_nwidgets]``.
+    """
+
+    def __init__(self, descrs: Descriptions):
+        self.root = descrs.tree.root
+        self.min_nwidgets = descrs.tree.min_nwidgets
+        self.max_nwidgets = descrs.tree.max_nwidgets
+        self.atomic = frozenset(descrs.atomic)
+        self.cont_children = {name: frozenset(w.children) for name, w in descrs.cont.items()}
+        self.cont_max = {name: w.max_nwidget for name, w in descrs.cont.items()}
+        self.comp_groups: Dict[str, Tuple[frozenset, ...]] = {}
+        for name, w in descrs.comp.items():
+            by_group = {item.group: set() for item in w.content}
+            for item in w.content:
+                by_group[item.group].add(item.name)
+            self.comp_groups[name] = tuple(frozenset(names) for names in by_group.values())
+        self.solo = frozenset(name for widgets in (descrs.atomic, descrs.comp, descrs.cont)
+                              for name, w in widgets.items() if w.solo)
+
+    def validate(self, tree_id: int, source: str, tree: TreeDTO) -> List[Violation]:
+        violations = []
+        if tree.root.name != self.root:
+            violations.append(Violation(tree_id, source, "root", f"root is {tree.root.name}, expected {self.root}"))
+
+        solo_counts: Dict[str, int] = {}
+        nwidgets = self._check_node(tree_id, source, tree.root, False, solo_counts, violations)
+        for name, count in solo_counts.items():
+            if count > 1:
+                violations.append(Violation(tree_id, source, "solo", f"solo widget {name} appears {count} times"))
+        if not self.min_nwidgets <= nwidgets <= self.max_nwidgets:
+            violations.append(Violation(tree_id, source, "size", f"{nwidgets} widgets, expected "
+                                                                 f"[{self.min_nwidgets}, {self.max_nwidgets}]"))
+        return violations
+
+    def _check_node(self, tree_id: int, source: str, node: NodeDTO, is_content: bool, solo_counts: Dict[str, int],
+                    violations: List[Violation]) -> int:
+        """Checks the subtree of ``node``, returns the number of widgets in it."""
+        name = node.name
+        children = node.children
+        if name in self.solo:
+            solo_counts[name] = solo_counts.get(name, 0) + 1
+
+        if name in self.atomic:
+            if children:
+                violations.append(Violation(tree_id, source, "atomic", f"atomic {name} has {len(children)} children"))
+        elif name in self.cont_children:
+            allowed = self.cont_children[name]
+            for child in children:
+                if child.name not in allowed:
+                    violations.append(Violation(tree_id, source, "cont-child",
+                                                f"{child.name} is not allowed in {name}"))
+            if len(children) > self.cont_max[name]:
+                violations.append(Violation(tree_id, source, "cont-size", f"{name} has {len(children)} children, "
+                                                                          f"max {self.cont_max[name]}"))
+        elif name in self.comp_groups:
+            groups = self.comp_groups[name]
+            if len(children) != len(groups):
+                violations.append(Violation(tree_id, source, "comp-content",
+                                            f"{name} has {len(children)} children, "
+                                            f"expected {len(groups)} content groups"))
+            else:
+                for igroup, (child, group) in enumerate(zip(children, groups)):
+                    if child.name not in group:
+                        violations.append(Violation(tree_id, source, "comp-content",
+                                                    f"{child.name} is not in group {igroup} of {name}"))
+        else:
+            violations.append(Violation(tree_id, source, "unknown", f"unknown widget {name}"))
+
+        nwidgets = 0 if is_content else 1
+        children_are_content = name in self.comp_groups
+        for child in children:
+            nwidgets += self._check_node(tree_id, source, child, children_are_content, solo_counts, violations)
+        return nwidgets
+
+
+# process pool ---------------------------------------------------------------------------------------------------------
+# rule index of the worker process, compiled once by init_worker
+worker_rules: RuleIndex = None
+
+
+def init_worker(conf_path: Path):
+    global worker_rules
+    worker_rules = RuleIndex(Descriptions(conf_path))
+
+
+def validate_json_batch(trees: List[Tuple[int, Path]]) -> Tuple[int, List[Violation]]:
+    violations = []
+    for tree_id, tree_path in trees:
+        source = str(tree_path)
+        try:
+            tree_violations = worker_rules.validate(tree_id, source, Reader.read_tree(tree_path))
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            # unreadable json or json of another shape, the shape is not checked up front to keep valid trees fast
+            violations.append(Violation(tree_id, source, "format", f"can't read the tree: {e}"))
+            continue
+        violations.extend(tree_violations)
+    return len(trees), violations
+
+
+def validate_record_batch(trees_path: Path, names: List[str], records: List[Tuple[int, bytes]]) \
+        -> Tuple[int, List[Violation]]:
+    violations = []
+    for tree_id, record in records:
+        source = f"{trees_path} tree {tree_id + 1}"
+        try:
+            tree = decode_tree(record, names)
+        except ValueError as e:
+            # a record that can't be decoded is reported like any other broken tree
+            violations.append(Violation(tree_id, source, "format", str(e)))
+            continue
+        violations.extend(worker_rules.validate(tree_id, source, tree))
+    return len(records), violations
+
+
+# sources --------------------------------------------------------------------------------------------------------------
+def resolve_sources(paths: List[Path]) -> List[TreeSource]:
+    """Expands ``paths`` to the tree sources to validate.
+
+    A dataset root (``index.json`` or a directory holding it) gives the shards of the index, a shard directory gives
+    the shards of its manifests. These sources know the tree ids they must hold. A directory without manifests gives
+    its json trees and ``.tgb`` files, a ``.tgb`` file is taken as is.
+    """
+    sources = []
+    for path in paths:
+        index_path = path / INDEX_NAME if path.is_dir() else path
+        if index_path.name == INDEX_NAME and index_path.is_file():
+            index = read_index(index_path)
+            for shard in index.shards:
+                shard_path = index_path.parent / (shard.path if shard.trees_path is None else shard.trees_path)
+                sources.append(TreeSource(shard_path, shard.tree_format, range(shard.start, shard.stop)))
+        elif path.is_dir() and find_manifests([path]):
+            for manifest_path in find_manifests([path]):
+                manifest = read_manifest(manifest_path)
+                shard_path = path if manifest.trees_path is None else path / manifest.trees_path
+                sources.append(TreeSource(shard_path, manifest.tree_format, range(manifest.start, manifest.stop)))
+        elif path.is_dir():
+            sources.append(TreeSource(path, "json", None))
+            sources.extend(TreeSource(p, "bin", None) for p in sorted(path.iterdir()) if is_trees_file(p))
+        else:
+            sources.append(TreeSource(path, "bin", None))
+    return sources
+
+
+class Coverage(object):
+    """Tree ids met in a source, compared with the ids it is expected to hold."""
+
+    def __init__(self, source: TreeSource):
+        self.source = source
+        self._seen = None if source.expected is None else bytearray(len(source.expected))
+        self._nforeign = 0
+        self._duplicates: List[int] = []
+        self.errors: List[str] = []
+
+    def add(self, tree_id: int):
+        if self._seen is None:
+            return
+        offset = tree_id - self.source.expected.start
+        if 0 <= offset < len(self._seen):
+            if self._seen[offset]:
+                self._duplicates.append(tree_id)
+            self._seen[offset] = 1
+        else:
+            self._nforeign += 1
+
+    def problems(self) -> List[str]:
+        """Read errors, missing, duplicate and unexpected trees, tree numbers are 1-based as in file names."""
+        problems = list(self.errors)
+        if self._seen is None:
+            return problems
+        start = self.source.expected.start
+        offset = self._seen.find(0)
+        while offset != -1:
+            end = self._seen.find(1, offset)
+            if end == -1:
+                end = len(self._seen)
+            if end - offset == 1:
+                problems.append(f"{self.source.path}: missing tree {start + end}")
+            else:
+                problems.append(f"{self.source.path}: missing trees {start + offset + 1}-{start + end}")
+            offset = self._seen.find(0, end)
+        if self._duplicates:
+            numbers = ", ".join(str(tree_id + 1) for tree_id in self._duplicates[:MAX_DUPLICATES_REPORT])
+            more = ", ..." if len(self._duplicates) > MAX_DUPLICATES_REPORT else ""
+            problems.append(f"{self.source.path}: {len(self._duplicates)} duplicate trees, numbers {numbers}{more}")
+        if self._nforeign:
+            problems.append(f"{self.source.path}: {self._nforeign} trees outside numbers "
+                            f"{start + 1}-{self.source.expected.stop}")
+        return problems
+
+
+def list_json_trees(dir_path: Path) -> List[Tuple[int, Path]]:
+    """Ids and paths of the ``tree<N>.json`` files in ``dir_path``, sorted by id."""
+    trees = []
+    for p in dir_path.iterdir():
+        match = TREE_FILE_RE.match(p.name)
+        if match:
+            trees.append((int(match.group(1)) - 1, p))
+    trees.sort()
+    return trees
+
+
+def iter_batches(sources: List[TreeSource], batch_size: int, coverages: List[Coverage]) \
+        -> Iterator[Tuple[Callable, Tuple]]:
+    """Splits the trees of ``sources`` into batches of work for the pool, tree ids met are added to ``coverages``.
+
+    A json source with a manifest takes only the trees of its range, several shards may share one directory.
+    """
+    json_trees: Dict[Path, List[Tuple[int, Path]]] = {}
+    for source in sources:
+        coverage = Coverage(source)
+        coverages.append(coverage)
+        if not source.path.exists():
+            # a shard listed in an index but gone from disk, its trees are reported as missing
+            continue
+        if source.tree_format == "json":
+            if source.path not in json_trees:
+                json_trees[source.path] = list_json_trees(source.path)
+            trees = json_trees[source.path]
+            if source.expected is not None:
+                trees = [tree for tree in trees if tree[0] in source.expected]
+            for tree_id, _ in trees:
+                coverage.add(tree_id)
+            for start in range(0, len(trees), batch_size):
+                yield validate_json_batch, (trees[start:start + batch_size],)
+            continue
+
+        try:
+            with TreeFileReader(source.path) as reader:
+                records = []
+                for record in reader.records():
+                    coverage.add(record[0])
+                    records.append(record)
+                    if len(records) == batch_size:
+                        yield validate_record_batch, (source.path, reader.names, records)
+                        records = []
+                if records:
+                    yield validate_record_batch, (source.path, reader.names, records)
+        except ValueError as e:
+            # a truncated or foreign stream, trees read before the break are still checked
+            coverage.errors.append(str(e))
+
+
+def validate_paths(paths: List[Path], conf_path: Path, jobs: int, batch_size: int = 1000) \
+        -> Tuple[int, List[Violation], List[str]]:
+    """Validates the trees of ``paths`` against the config in ``conf_path``, see ``resolve_sources``.
+
+    Batches are checked by ``jobs`` worker processes, at most ``2 * jobs`` of them are in flight so memory stays
+    bounded on big datasets. Returns the number of checked trees, the violations sorted by tree id and the trees
+    missing from the ranges declared by manifests.
+    """
+    ntrees = 0
+    violations = []
+    coverages = []
+    sources = resolve_sources(paths)
+    if jobs == 1:
+        init_worker(conf_path)
+        for fn, args in iter_batches(sources, batch_size, coverages):
+            batch_ntrees, batch_violations = fn(*args)
+            ntrees += batch_ntrees
+            violations.extend(batch_violations)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(conf_path,)) as executor:
+            pending = set()
+            for fn, args in iter_batches(sources, batch_size, coverages):
+                if len(pending) >= 2 * jobs:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    ntrees += collect_done(done, violations)
+                pending.add(executor.submit(fn, *args))
+            ntrees += collect_done(pending, violations)
+
+    violations.sort(key=lambda violation: (violation.tree_id, violation.source))
+    problems = [problem for coverage in coverages for problem in coverage.problems()]
+    return ntrees, violations, problems
+
+
+def collect_done(futures: Iterable[Future], violations: List[Violation]) -> int:
+    ntrees = 0
+    for future in futures:
+        batch_ntrees, batch_violations = future.result()
+        ntrees += batch_ntrees
+        violations.extend(batch_violations)
+    return ntrees
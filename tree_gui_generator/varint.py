@@ -0,0 +1,44 @@
+__all__ = ["encode_varint", "decode_varint", "encode_deltas", "decode_deltas"]
+
+from typing import List, Iterable, Tuple
+
+
+def encode_varint(value: int, out: bytearray):
+    """Appends a non-negative int as LEB128: 7 bits per byte, high bit set on all bytes but the last."""
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    """Reads a varint at ``pos``, returns it and the position right after it."""
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_deltas(sorted_values: Iterable[int]) -> bytes:
+    out = bytearray()
+    prev = 0
+    for value in sorted_values:
+        encode_varint(value - prev, out)
+        prev = value
+    return bytes(out)
+
+
+def decode_deltas(buf: bytes) -> List[int]:
+    result = []
+    value = 0
+    pos = 0
+    while pos < len(buf):
+        delta, pos = decode_varint(buf, pos)
+        value += delta
+        result.append(value)
+    return result
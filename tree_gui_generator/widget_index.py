@@ -0,0 +1,173 @@
+__all__ = ["WidgetIndex", "choice_key", "tree_keys", "changed_widget_keys"]
+
+from base64 import b64encode, b64decode
+from pathlib import Path
+from typing import Dict, List, Set, Iterable, Optional
+
+from tree_gui_generator.dto import WidgetIndexDTO
+from tree_gui_generator.fileproc import FileProc
+from tree_gui_generator.model import Descriptions, Node, Reader
+from tree_gui_generator.varint import encode_varint, encode_deltas, decode_deltas
+
+
+def choice_key(comp_name: str, group: int, name: str) -> str:
+    """Index key of the widget ``name`` chosen for the ``group`` of the composite ``comp_name``."""
+    return f"{comp_name}/{group}:{name}"
+
+
+def tree_keys(root: 'Node', descrs: Descriptions) -> Set[str]:
+    """Widget names and composite group choices met in the tree.
+
+    Works for ``Node`` and ``NodeDTO`` trees alike.
+    """
+    keys = set()
+    collect_tree_keys(root, descrs, keys)
+    return keys
+
+
+def collect_tree_keys(node: 'Node', descrs: Descriptions, keys: Set[str]):
+    keys.add(node.name)
+    comp = descrs.comp.get(node.name)
+    for child in node.children:
+        if comp is not None:
+            for item in comp.content:
+                if item.name == child.name:
+                    keys.add(choice_key(comp.name, item.group, child.name))
+        collect_tree_keys(child, descrs, keys)
+
+
+class WidgetIndex(object):
+    """Inverted index from widget names and composite group choices to ids of the trees holding them.
+
+    Ids of a key are kept sorted and delta-encoded as varints, which takes about a byte per tree. Trees must be added
+    in increasing id order, ``set_ids`` rewrites a key as a whole.
+    """
+
+    def __init__(self, start: int, stop: int):
+        self._start = start
+        self._stop = stop
+        self._postings: Dict[str, bytearray] = {}
+        self._last: Dict[str, int] = {}
+
+    @property
+    def start(self) -> int:
+        return self._start
+
+    @property
+    def stop(self) -> int:
+        return self._stop
+
+    def keys(self) -> List[str]:
+        return list(self._postings.keys())
+
+    def add_tree(self, tree_id: int, keys: Iterable[str]):
+        for key in keys:
+            posting = self._postings.get(key)
+            if posting is None:
+                posting = self._postings[key] = bytearray()
+                prev = 0
+            else:
+                prev = self._last.get(key)
+                if prev is None:
+                    prev = decode_deltas(posting)[-1]
+            encode_varint(tree_id - prev, posting)
+            self._last[key] = tree_id
+
+    def ids(self, key: str) -> List[int]:
+        return decode_deltas(self._postings.get(key, b""))
+
+    def set_ids(self, key: str, ids: List[int]):
+        if ids:
+            self._postings[key] = bytearray(encode_deltas(ids))
+            self._last[key] = ids[-1]
+        else:
+            self._postings.pop(key, None)
+            self._last.pop(key, None)
+
+    def trees_with(self, keys: Iterable[str]) -> List[int]:
+        result = set()
+        for key in keys:
+            result.update(self.ids(key))
+        return sorted(result)
+
+    def merge(self, other: 'WidgetIndex'):
+        for key in other.keys():
+            self.set_ids(key, sorted(set(self.ids(key)).union(other.ids(key))))
+        self._start = min(self._start, other.start)
+        self._stop = max(self._stop, other.stop)
+
+    def to_dto(self) -> WidgetIndexDTO:
+        keys = {key: b64encode(bytes(self._postings[key])).decode("ascii") for key in sorted(self._postings)}
+        return WidgetIndexDTO(self._start, self._stop, keys)
+
+    @classmethod
+    def from_dto(cls, dto: WidgetIndexDTO) -> 'WidgetIndex':
+        index = cls(dto.start, dto.stop)
+        for key, posting in dto.keys.items():
+            index._postings[key] = bytearray(b64decode(posting))
+        return index
+
+    def write(self, p: Path):
+        FileProc.write_json(self.to_dto(), p)
+
+    @classmethod
+    def read(cls, p: Path) -> 'WidgetIndex':
+        return cls.from_dto(WidgetIndexDTO(**FileProc.read_json(p)))
+
+    def __repr__(self):
+        return f"<WidgetIndex -- trees: [{self._start}, {self._stop}), keys: {len(self._postings)}, " \
+               f"bytes: {sum(len(posting) for posting in self._postings.values())}>"
+
+
+def changed_widget_keys(old_path: Path, new_path: Path) -> Optional[Set[str]]:
+    """Index keys of the widgets whose descriptions differ between two config directories.
+
+    Trees holding none of the keys are still valid for the new config. ``None`` means every tree is affected, that is
+    the case when ``tree_descr.json`` is changed.
+    """
+    atomic_old, comp_old, cont_old, tree_old = (FileProc.read_json(p) for p in Reader.descr_paths(old_path))
+    atomic_new, comp_new, cont_new, tree_new = (FileProc.read_json(p) for p in Reader.descr_paths(new_path))
+    if tree_old != tree_new:
+        return None
+
+    keys = set()
+    for widgets_old, widgets_new in ((atomic_old, atomic_new), (cont_old, cont_new)):
+        by_name_new = {widget["name"]: widget for widget in widgets_new}
+        for widget in widgets_old:
+            if by_name_new.get(widget["name"]) != widget:
+                keys.add(widget["name"])
+
+    by_name_new = {widget["name"]: widget for widget in comp_new}
+    for widget in comp_old:
+        name = widget["name"]
+        widget_new = by_name_new.get(name)
+        if widget_new is None:
+            keys.add(name)
+            continue
+        content_old = widget.get("content", [])
+        content_new = widget_new.get("content", [])
+        if without_content(widget) != without_content(widget_new) \
+                or {item["group"] for item in content_old} != {item["group"] for item in content_new}:
+            keys.add(name)
+            continue
+        # a new option or a changed prob shifts the odds of every option of the group
+        for group in {item["group"] for item in content_old}:
+            group_old = [item for item in content_old if item["group"] == group]
+            group_new = [item for item in content_new if item["group"] == group]
+            if group_odds(group_old) != group_odds(group_new):
+                keys.update(choice_key(name, group, item["name"]) for item in group_old)
+
+        items_new = {(item["group"], item["name"]): item for item in content_new}
+        for item in content_old:
+            if items_new.get((item["group"], item["name"])) != item:
+                keys.add(choice_key(name, item["group"], item["name"]))
+    return keys
+
+
+def group_odds(group_items: List[Dict]) -> Dict[str, float]:
+    """Options of a composite content group and their probs, 1 is the default as in ``CompWidgetContentDTO``."""
+    return {item["name"]: item.get("prob", 1) for item in group_items}
+
+
+def without_content(comp_widget: Dict) -> Dict:
+    return {key: value for key, value in comp_widget.items() if key != "content"}